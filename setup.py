@@ -22,6 +22,7 @@ setuptools.setup(
     ],
     package_dir={"": "src"},
     packages=setuptools.find_packages(where="src"),
-    python_requires=">=3.6",
+    python_requires=">=3.8",
     install_requires=["absl-py", "jaxlib", "matplotlib", "numpy"],
+    extras_require={"sparse": ["scipy"]},
 )
@@ -7,7 +7,11 @@ from differential_value_iteration.environments import structure
 
 
 class Evaluation(algorithm.Evaluation):
-  """Differential Value Iteration for prediction."""
+  """Differential Value Iteration for prediction.
+
+  Synchronized updates also accept a batch of independent runs: |K| x |S|
+  initial_values with a |K| x 1 step_size, which gives a |K| x 1 r_bar.
+  """
 
   def __init__(
       self,
@@ -30,13 +34,17 @@ class Evaluation(algorithm.Evaluation):
 
   def reset(self):
     self.current_values = self.initial_values.copy()
-    self.r_bar = self.initial_r_bar
+    if self.current_values.ndim == 1:
+      self.r_bar = self.initial_r_bar
+    else:
+      # One r_bar per row of a batch of value estimates.
+      self.r_bar = np.full((len(self.current_values), 1), self.initial_r_bar)
 
   def diverged(self) -> bool:
     if not np.isfinite(self.current_values).all():
       logging.warn('Current values not finite in DVI.')
       return True
-    if not np.isfinite(self.r_bar):
+    if not np.isfinite(self.r_bar).all():
       logging.warn('r_bar not finite in DVI.')
       return True
     return False
@@ -50,10 +58,15 @@ class Evaluation(algorithm.Evaluation):
     return self.update_async()
 
   def update_sync(self) -> np.ndarray:
-    changes = self.mrp.rewards - self.r_bar + np.dot(self.mrp.transitions,
-                                                     self.current_values) - self.current_values
+    # Accumulate in place into the result of the dot product to avoid
+    # allocating a temporary for every term. Array methods are used since
+    # they skip NumPy function dispatch, which dominates for small problems.
+    changes = self.current_values.dot(self.mrp.transitions.T)
+    changes += self.mrp.rewards
+    changes -= self.r_bar
+    changes -= self.current_values
     self.current_values += self.step_size * changes
-    self.r_bar += self.beta * np.sum(changes)
+    self.r_bar += self.beta * changes.sum(axis=-1, keepdims=changes.ndim > 1)
     return changes
 
   def update_async(self) -> np.ndarray:
@@ -66,7 +79,9 @@ class Evaluation(algorithm.Evaluation):
     return change
 
   def get_estimates(self):
-    return {'v': self.current_values, 'r_bar': self.r_bar}
+    # A batch keeps r_bar as a |K| x 1 column for broadcasting, expose |K|.
+    r_bar = self.r_bar if np.ndim(self.r_bar) == 0 else self.r_bar[:, 0]
+    return {'v': self.current_values, 'r_bar': r_bar}
 
 
 class Control(algorithm.Control):
@@ -113,8 +128,9 @@ class Control(algorithm.Control):
     return self.update_async()
 
   def update_sync(self) -> np.ndarray:
-    temp_s_by_a = self.mdp.rewards - self.r_bar + np.dot(self.mdp.transitions,
-                                                         self.current_values) - self.current_values
+    next_values = self.mdp.flat_transitions.dot(self.current_values).reshape(
+        self.mdp.rewards.shape)
+    temp_s_by_a = self.mdp.rewards - self.r_bar + next_values - self.current_values
     changes = np.max(temp_s_by_a, axis=0)
     self.current_values += self.step_size * changes
     self.r_bar += self.beta * np.sum(changes)
@@ -132,8 +148,9 @@ class Control(algorithm.Control):
     return change
 
   def greedy_policy(self) -> np.ndarray:
-    temp_s_by_a = self.mdp.rewards - self.r_bar + np.dot(self.mdp.transitions,
-                                                         self.current_values) - self.current_values
+    next_values = self.mdp.flat_transitions.dot(self.current_values).reshape(
+        self.mdp.rewards.shape)
+    temp_s_by_a = self.mdp.rewards - self.r_bar + next_values - self.current_values
     return np.argmax(temp_s_by_a, axis=0)
 
   def get_estimates(self):
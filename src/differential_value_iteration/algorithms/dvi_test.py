@@ -12,6 +12,7 @@ from differential_value_iteration.environments import micro
 from differential_value_iteration.environments import structure
 
 _GARET1, _GARET2, _GARET3 = garet.GARET1, garet.GARET2, garet.GARET3
+_GARET3_SPARSE = functools.partial(garet.GARET3, sparse=True)
 
 
 class DVIEvaluationTest(parameterized.TestCase):
@@ -64,11 +65,49 @@ class DVIEvaluationTest(parameterized.TestCase):
     with self.subTest('converged'):
       self.assertAlmostEqual(change_sum, 0., places=tolerance_places)
 
+  @parameterized.parameters(np.float32, np.float64)
+  def test_dvi_sync_batch_matches_individual(self, dtype: np.dtype):
+    """A batch of step sizes matches running each step size on its own."""
+    environment = micro.create_mrp2(dtype)
+    step_sizes = np.array([.1, .5, 1.], dtype=dtype)
+    make_algorithm = functools.partial(
+        dvi.Evaluation,
+        mrp=environment,
+        beta=.5,
+        initial_r_bar=.5,
+        synchronized=True)
+    batch = make_algorithm(
+        step_size=step_sizes[:, None],
+        initial_values=np.zeros((len(step_sizes), environment.num_states),
+                                dtype=dtype))
+    individuals = [
+        make_algorithm(
+            step_size=step_size,
+            initial_values=np.zeros(environment.num_states, dtype=dtype))
+        for step_size in step_sizes]
+
+    for _ in range(20):
+      batch_changes = batch.update()
+      individual_changes = [alg.update() for alg in individuals]
+
+    with self.subTest('maintained_types'):
+      self.assertTrue(batch.types_ok())
+    with self.subTest('changes'):
+      np.testing.assert_allclose(batch_changes, individual_changes,
+                                 rtol=1e-5, atol=1e-5)
+    for estimate_name, estimate in batch.get_estimates().items():
+      with self.subTest(estimate_name):
+        np.testing.assert_allclose(
+            np.reshape(estimate, (len(step_sizes), -1)),
+            [np.reshape(alg.get_estimates()[estimate_name], -1)
+             for alg in individuals],
+            rtol=1e-5, atol=1e-5)
+
 
 class DVIControlTest(parameterized.TestCase):
 
   @parameterized.parameters(itertools.product(
-      (micro.create_mdp1, _GARET1, _GARET2, _GARET3),
+      (micro.create_mdp1, _GARET1, _GARET2, _GARET3, _GARET3_SPARSE),
       (np.float32, np.float64,))
   )
   def test_dvi_sync_converges(self,
@@ -8,7 +8,11 @@ from differential_value_iteration.environments import structure
 
 
 class Evaluation(algorithm.Evaluation):
-  """Multichain DVI for prediction, section 3.1.1 in paper."""
+  """Multichain DVI for prediction, section 3.1.1 in paper.
+
+  Synchronized updates also accept |K| x |S| initial_values with a |K| x 1
+  step_size to run K independent estimates at once.
+  """
 
   def __init__(
       self,
@@ -37,7 +41,8 @@ class Evaluation(algorithm.Evaluation):
 
   def reset(self):
     self.current_values = self.initial_values.copy()
-    self.r_bar = self.initial_r_bar.copy()
+    self.r_bar = np.broadcast_to(self.initial_r_bar,
+                                 self.current_values.shape).copy()
 
   def diverged(self) -> bool:
     if not np.isfinite(self.current_values).all():
@@ -57,9 +62,12 @@ class Evaluation(algorithm.Evaluation):
     return self.update_async()
 
   def update_sync(self) -> np.ndarray:
-    self.r_bar = np.dot(self.mrp.transitions, self.r_bar)
-    changes = self.mrp.rewards - self.r_bar + np.dot(self.mrp.transitions,
-                                                     self.current_values) - self.current_values
+    self.r_bar = self.r_bar.dot(self.mrp.transitions.T)
+    # Same in-place accumulation as dvi.Evaluation.update_sync.
+    changes = self.current_values.dot(self.mrp.transitions.T)
+    changes += self.mrp.rewards
+    changes -= self.r_bar
+    changes -= self.current_values
     self.current_values += self.step_size * changes
     self.r_bar += self.beta * changes
     return changes
@@ -161,7 +169,8 @@ class Control1(algorithm.Control):
     return delta
 
   def update_sync(self) -> np.ndarray:
-    temp_s_by_a = np.dot(self.mdp.transitions, self.r_bar).T
+    temp_s_by_a = self.mdp.flat_transitions.dot(self.r_bar).reshape(
+        self.mdp.rewards.shape).T
     self.r_bar = np.max(temp_s_by_a, axis=1)
     changes = np.zeros(self.mdp.num_states, dtype=self.mdp.rewards.dtype)
     for (s, action_vals), r_bar_s in zip(enumerate(temp_s_by_a), self.r_bar):
@@ -209,7 +218,8 @@ class Control1(algorithm.Control):
   def greedy_policy(self) -> np.ndarray:
     # temp_s_by_a = np.dot(self.mdp.transitions, self.r_bar)
     # return np.argmax(temp_s_by_a, axis=0)
-    temp_s_by_a = np.dot(self.mdp.transitions, self.r_bar).T
+    temp_s_by_a = self.mdp.flat_transitions.dot(self.r_bar).reshape(
+        self.mdp.rewards.shape).T
     self.r_bar = np.max(temp_s_by_a, axis=1)
     best_actions = np.zeros(self.mdp.num_states, dtype=np.int32)
     for (s, action_vals), r_bar_s in zip(enumerate(temp_s_by_a), self.r_bar):
@@ -225,8 +235,10 @@ class Control1(algorithm.Control):
 
 class Control2(Control1):
   def update_sync(self) -> np.ndarray:
-    self.r_bar = np.max(np.dot(self.mdp.transitions, self.r_bar).T, axis=1)
-    next_vals = np.dot(self.mdp.transitions, self.current_values)
+    self.r_bar = np.max(self.mdp.flat_transitions.dot(self.r_bar).reshape(
+        self.mdp.rewards.shape), axis=0)
+    next_vals = self.mdp.flat_transitions.dot(self.current_values).reshape(
+        self.mdp.rewards.shape)
     next_val_diffs = next_vals - self.current_values
     r_diffs = self.mdp.rewards - self.r_bar
     delta = np.max(r_diffs + next_val_diffs, axis=0)
@@ -1,4 +1,5 @@
 """Tests for basic functioning of Multichain DVI algorithms."""
+import functools
 import itertools
 import time
 from typing import Callable
@@ -84,6 +85,43 @@ class MDVIEvaluationTest(parameterized.TestCase):
     with self.subTest('converged'):
       self.assertAlmostEqual(change_sum, 0., places=tolerance_places)
 
+  @parameterized.parameters(np.float32, np.float64)
+  def test_mdvi_sync_batch_matches_individual(self, dtype: np.dtype):
+    """A batch of step sizes matches running each step size on its own."""
+    environment = micro.create_mrp2(dtype)
+    step_sizes = np.array([.1, .5, 1.], dtype=dtype)
+    make_algorithm = functools.partial(
+        mdvi.Evaluation,
+        mrp=environment,
+        beta=.5,
+        initial_r_bar=.5,
+        synchronized=True)
+    batch = make_algorithm(
+        step_size=step_sizes[:, None],
+        initial_values=np.zeros((len(step_sizes), environment.num_states),
+                                dtype=dtype))
+    individuals = [
+        make_algorithm(
+            step_size=step_size,
+            initial_values=np.zeros(environment.num_states, dtype=dtype))
+        for step_size in step_sizes]
+
+    for _ in range(20):
+      batch_changes = batch.update()
+      individual_changes = [alg.update() for alg in individuals]
+
+    with self.subTest('maintained_types'):
+      self.assertTrue(batch.types_ok())
+    with self.subTest('changes'):
+      np.testing.assert_allclose(batch_changes, individual_changes,
+                                 rtol=1e-5, atol=1e-5)
+    for estimate_name, estimate in batch.get_estimates().items():
+      with self.subTest(estimate_name):
+        np.testing.assert_allclose(
+            np.reshape(estimate, (len(step_sizes), -1)),
+            [np.reshape(alg.get_estimates()[estimate_name], -1)
+             for alg in individuals],
+            rtol=1e-5, atol=1e-5)
 
 
 class MDVIControlTest(parameterized.TestCase):
@@ -7,7 +7,11 @@ from differential_value_iteration.environments import structure
 
 
 class Evaluation(algorithm.Evaluation):
-  """Relative Value Iteration for prediction."""
+  """Relative Value Iteration for prediction.
+
+  Synchronized updates also accept |K| x |S| initial_values with a |K| x 1
+  step_size to run K independent estimates at once.
+  """
 
   def __init__(
       self,
@@ -43,10 +47,12 @@ class Evaluation(algorithm.Evaluation):
     return self.update_async()
 
   def update_sync(self) -> np.ndarray:
-    changes = self.mrp.rewards + np.dot(
-        self.mrp.transitions,
-        self.current_values - self.current_values[
-          self.reference_index]) - self.current_values
+    # Build changes in place on top of the dot product (see DVI).
+    changes = (self.current_values -
+               self.current_values[..., self.reference_index, None]).dot(
+        self.mrp.transitions.T)
+    changes += self.mrp.rewards
+    changes -= self.current_values
     self.current_values += self.step_size * changes
     return changes
 
@@ -60,7 +66,7 @@ class Evaluation(algorithm.Evaluation):
     return change
   
   def get_estimates(self):
-    return {'v': self.current_values, 'r_bar': self.current_values[self.reference_index]}
+    return {'v': self.current_values, 'r_bar': self.current_values[..., self.reference_index]}
 
 
 class Control(algorithm.Control):
@@ -100,10 +106,10 @@ class Control(algorithm.Control):
     return self.update_async()
 
   def update_sync(self) -> np.ndarray:
-    temp_s_by_a = self.mdp.rewards + np.dot(self.mdp.transitions,
-                                            self.current_values -
-                                            self.current_values[
-                                              self.reference_index]) - self.current_values
+    next_values = self.mdp.flat_transitions.dot(
+        self.current_values - self.current_values[self.reference_index])
+    temp_s_by_a = self.mdp.rewards + next_values.reshape(
+        self.mdp.rewards.shape) - self.current_values
     changes = np.max(temp_s_by_a, axis=0)
     self.current_values += self.step_size * changes
     return changes
@@ -119,10 +125,9 @@ class Control(algorithm.Control):
     return change
 
   def greedy_policy(self) -> np.ndarray:
-    temp_s_by_a = self.mdp.rewards + np.dot(self.mdp.transitions,
-                                            self.current_values -
-                                            self.current_values[
-                                              self.reference_index])
+    next_values = self.mdp.flat_transitions.dot(
+        self.current_values - self.current_values[self.reference_index])
+    temp_s_by_a = self.mdp.rewards + next_values.reshape(self.mdp.rewards.shape)
     return np.argmax(temp_s_by_a, axis=0)
 
   def get_estimates(self):
@@ -6,31 +6,33 @@ https://era.library.ualberta.ca/items/8fc4a1f6-95c9-4da8-aecd-96867babdf4c
 The current implementation does not support online, sample-based operation.
 
 Instead, it is appropriate for value/policy iteration algorithm research.
+
+JAX is only imported when an instance is generated with use_jax=True, since
+importing it is slow compared to building the small problems used here.
 """
 import functools
-import jax
-import jax.numpy as jnp
 import numpy as np
 from differential_value_iteration.environments import structure
 
 
-def create(seed: int, num_states: int, num_actions: int,
-    branching_factor: int, dtype: np.dtype) -> structure.MarkovDecisionProcess:
-  """Creates transition and reward matrices for GARET instance."""
-  rng_key = jax.random.PRNGKey(seed=seed)
-  garet_final_shape = (num_states, num_actions, num_states)
-  # Keys for branching_factor next state transitions for all (s, a) pairs.
-  new_keys = jax.random.split(rng_key, num_states * num_actions + 1)
-  new_state_keys = new_keys[1:]
-  rng_key = new_keys[0]
+def _build_jax(rng_key, num_states: int, num_actions: int,
+    branching_factor: int):
+  """Builds (A, S, S') transitions and (A, S) marginalized rewards with JAX.
 
-  # For each (s,a) pair, determine next states using jax.random.choice.
-  # Use jax.vmap to calculate this in parallel for all (s,a) pairs.
-  next_state_fn = jax.vmap(jax.random.choice, in_axes=(0, None, None, None))
+  Meant to be called through _jitted_build_jax().
+  """
+  import jax
+  import jax.numpy as jnp
 
-  # Array of the indices of resulting states.
-  next_states_flat = next_state_fn(new_state_keys, num_states,
-                                   (branching_factor,), False)
+  garet_final_shape = (num_states, num_actions, num_states)
+  # For each (s,a) pair, sample branching_factor distinct next states by
+  # taking the indices of the largest of a single batch of uniform draws.
+  # Much cheaper than vmapping jax.random.choice without replacement.
+  rng_key, next_states_key = jax.random.split(rng_key)
+  next_state_scores = jax.random.uniform(
+      key=next_states_key,
+      shape=(num_states * num_actions, num_states))
+  _, next_states_flat = jax.lax.top_k(next_state_scores, branching_factor)
 
   # Generate transition probabilities for all branches.
   rng_key, next_state_probs_key = jax.random.split(rng_key)
@@ -39,13 +41,9 @@ def create(seed: int, num_states: int, num_actions: int,
       key=next_state_probs_key,
       shape=(num_states * num_actions, branching_factor))
 
-  # Calculate sums per (s, a) and reshape conveniently for normalizing.
-  next_state_prob_sums = jnp.sum(next_state_probs_flat_unnormalized, axis=-1)
-  next_state_prob_sums = jnp.repeat(next_state_prob_sums, branching_factor)
-  next_state_prob_sums = next_state_prob_sums.reshape((-1, branching_factor))
-
-  # Normalize transition probabilities.
-  next_state_probs_flat = next_state_probs_flat_unnormalized / next_state_prob_sums
+  # Normalize transition probabilities by their per (s, a) sums.
+  next_state_probs_flat = next_state_probs_flat_unnormalized / jnp.sum(
+      next_state_probs_flat_unnormalized, axis=-1, keepdims=True)
 
   # Generate expected rewards for all branches.
   rng_key, transition_reward_key = jax.random.split(rng_key)
@@ -53,39 +51,140 @@ def create(seed: int, num_states: int, num_actions: int,
       key=transition_reward_key,
       shape=(num_states * num_actions, branching_factor))
 
-  # Create the transition and reward matrices.
-  transition_matrix_flat = jnp.zeros(
-      shape=(num_states * num_actions, num_states),
-      dtype=jnp.float32)
-  reward_matrix_flat = jnp.zeros(
-      shape=(num_states * num_actions, num_states),
-      dtype=jnp.float32)
-
-  first_dim_indices = jnp.arange(num_states * num_actions)
-  first_dim_indices = first_dim_indices.repeat(branching_factor)
-  transition_matrix_flat = transition_matrix_flat.at[
-    first_dim_indices, next_states_flat.ravel()].set(
-      next_state_probs_flat.ravel())
-
-  reward_matrix_flat = reward_matrix_flat.at[
-    first_dim_indices, next_states_flat.ravel()].set(
-      transition_expected_rewards_flat.ravel())
-
+  # Expand next state indices to one-hot rows, shape (|S| x |A|, b, |S|), and
+  # contract over branches. Avoids a scatter into a dense zeros matrix.
+  next_states_one_hot = jax.nn.one_hot(next_states_flat, num_states,
+                                       dtype=jnp.float32)
+  transition_matrix_flat = jnp.einsum('ab,abs->as', next_state_probs_flat,
+                                      next_states_one_hot)
   transition_matrix = transition_matrix_flat.reshape(garet_final_shape)
-  reward_matrix = reward_matrix_flat.reshape(garet_final_shape)
 
-  # Marginalize rewards matrix for structure.MarkovDecisionProcess.
-  reward_matrix_marginalized = jax.vmap(jax.vmap(jnp.dot))(transition_matrix,
-                                                           reward_matrix)
+  # Marginalize rewards over the b branches for
+  # structure.MarkovDecisionProcess, never building an (S, A, S') matrix.
+  reward_matrix_marginalized = jnp.sum(
+      next_state_probs_flat * transition_expected_rewards_flat,
+      axis=-1).reshape((num_states, num_actions))
 
   # Restructure for structure.MarkovDecisionProcess (A, S, S') vs (S, A, S').
   transition_matrix = jnp.swapaxes(transition_matrix, 0, 1)
   # Restructure for structure.MarkovDecisionProcess (A, S) vs (S, A).
   reward_matrix_marginalized = jnp.swapaxes(reward_matrix_marginalized, 0, 1)
-  return structure.MarkovDecisionProcess(
-      transitions=np.array(transition_matrix, dtype=dtype),
-      rewards=np.array(reward_matrix_marginalized, dtype=dtype),
-      name=f'GARET S:{num_states} A:{num_actions} B:{branching_factor} K:{rng_key} D:{dtype.__name__}')
+  return transition_matrix, reward_matrix_marginalized, rng_key
+
+
+@functools.lru_cache(maxsize=None)
+def _jitted_build_jax():
+  """Returns _build_jax compiled with the problem shape as static arguments.
+
+  JAX then compiles once per (num_states, num_actions, branching_factor) so
+  repeated calls for the same problem size run as a single fused XLA
+  computation.
+  """
+  import jax
+  return jax.jit(_build_jax,
+                 static_argnames=('num_states', 'num_actions',
+                                  'branching_factor'))
+
+
+def _build_numpy(seed: int, num_states: int, num_actions: int,
+    branching_factor: int):
+  """Builds (A, S, S') transitions and (A, S) marginalized rewards with NumPy.
+
+  For the problem sizes used here this is much faster than the JAX version,
+  which is dominated by dispatch and compilation overhead.
+  """
+  rng = np.random.default_rng(seed)
+  num_pairs = num_states * num_actions
+
+  # For each (s,a) pair, sample branching_factor distinct next states by
+  # taking the indices of the smallest uniform draws over all states.
+  next_states_flat = np.argpartition(rng.random((num_pairs, num_states)),
+                                     branching_factor - 1,
+                                     axis=-1)[:, :branching_factor]
+
+  # Generate normalized transition probabilities for all branches.
+  next_state_probs_flat = rng.random((num_pairs, branching_factor))
+  next_state_probs_flat /= next_state_probs_flat.sum(axis=-1, keepdims=True)
+
+  # Generate expected rewards for all branches.
+  transition_expected_rewards_flat = rng.standard_normal(
+      (num_pairs, branching_factor))
+
+  transition_matrix_flat = np.zeros((num_pairs, num_states))
+  np.put_along_axis(transition_matrix_flat, next_states_flat,
+                    next_state_probs_flat, axis=-1)
+  transition_matrix = transition_matrix_flat.reshape(
+      (num_states, num_actions, num_states))
+
+  # Marginalize rewards over the b branches as a row-wise dot product, which
+  # avoids materializing the elementwise product.
+  reward_matrix_marginalized = np.einsum(
+      'ab,ab->a', next_state_probs_flat,
+      transition_expected_rewards_flat).reshape((num_states, num_actions))
+
+  # Restructure for structure.MarkovDecisionProcess (A, S, S') vs (S, A, S').
+  transition_matrix = np.swapaxes(transition_matrix, 0, 1)
+  # Restructure for structure.MarkovDecisionProcess (A, S) vs (S, A).
+  reward_matrix_marginalized = np.swapaxes(reward_matrix_marginalized, 0, 1)
+  return transition_matrix, reward_matrix_marginalized
+
+
+@functools.lru_cache(maxsize=32)
+def create(seed: int, num_states: int, num_actions: int,
+    branching_factor: int, dtype: np.dtype,
+    use_jax: bool = False,
+    sparse: bool = False) -> structure.MarkovDecisionProcess:
+  """Creates transition and reward matrices for GARET instance.
+
+  Instances are cached by their arguments, so repeated calls return the same
+  MDP. Its arrays are read-only so that sharing it is safe.
+
+  Args:
+    seed: Seed for the random number generator.
+    num_states: Number of states.
+    num_actions: Number of actions.
+    branching_factor: Number of possible next states for each (s, a) pair.
+    dtype: Dtype for reward/transition matrices: np.float32/np.float64
+    use_jax: Generate the instance with JAX instead of NumPy. The two backends
+      produce different instances for the same seed.
+    sparse: Multiply by transitions in CSR form. Only branching_factor of
+      num_states entries per row are non-zero, so this pays off for large
+      num_states. Requires scipy (the 'sparse' extra).
+
+  Returns:
+    The MDP.
+  """
+  if use_jax:
+    import jax
+    rng_key = jax.random.PRNGKey(seed=seed)
+    transition_matrix, reward_matrix_marginalized, rng_key = jax.device_get(
+        _jitted_build_jax()(rng_key,
+                            num_states=num_states,
+                            num_actions=num_actions,
+                            branching_factor=branching_factor))
+    key_name = rng_key
+  else:
+    transition_matrix, reward_matrix_marginalized = _build_numpy(
+        seed=seed,
+        num_states=num_states,
+        num_actions=num_actions,
+        branching_factor=branching_factor)
+    key_name = seed
+  # Both builders swap axes, so copy into C order for fast row access.
+  transition_matrix = np.ascontiguousarray(transition_matrix, dtype=dtype)
+  reward_matrix_marginalized = np.ascontiguousarray(reward_matrix_marginalized,
+                                                    dtype=dtype)
+  transition_matrix.setflags(write=False)
+  reward_matrix_marginalized.setflags(write=False)
+  mdp = structure.MarkovDecisionProcess(
+      transitions=transition_matrix,
+      rewards=reward_matrix_marginalized,
+      sparse=sparse,
+      name=f'GARET S:{num_states} A:{num_actions} B:{branching_factor} K:{key_name} D:{dtype.__name__}')
+  if sparse:
+    # Build the CSR matrix now rather than during the first update.
+    _ = mdp.flat_transitions
+  return mdp
 
 GARET1 = functools.partial(create,
                            seed=42,
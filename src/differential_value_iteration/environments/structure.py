@@ -1,4 +1,5 @@
 import dataclasses
+import functools
 
 import numpy as np
 
@@ -33,10 +34,10 @@ class MarkovRewardProcess:
           f'mrp transition and reward dtypes do not match: {self.transitions.dtype.__name__} vs {self.rewards.dtype.__name__}')
 
     # Ensure transition probabilities sum to 1 for all states.
-    state_probability_sums = self.transitions.sum(axis=-1)
-    failed_unity = np.where(state_probability_sums != 1., True, False)
-    num_invalid_states = np.sum(failed_unity)
-    if num_invalid_states:
+    state_probability_errors = np.abs(1. - self.transitions.sum(axis=-1))
+    # Negated <= so NaN sums also fail.
+    failed_unity = ~(state_probability_errors <= _TRANSITION_SUM_TOLERANCE)
+    if failed_unity.any():
       bad_states = np.argwhere(failed_unity)
       raise ValueError(
           f'Invalid Reward Process, some states do not have transitions that sum to 1: {bad_states}')
@@ -53,6 +54,10 @@ class MarkovDecisionProcess:
   # |A| x |S| vector of rewards for each action.
   rewards: np.ndarray
   name: str
+  # Use a scipy.sparse CSR matrix for flat_transitions. Worthwhile when there
+  # are many states with few possible next states each. Requires scipy, e.g.
+  # pip install differential_value_iteration[sparse].
+  sparse: bool = False
 
   def __post_init__(self):
     """Raises error if transition or reward matrices malformed."""
@@ -75,25 +80,38 @@ class MarkovDecisionProcess:
     if self.transitions.dtype != self.rewards.dtype:
       raise ValueError(
           f'mdp transition and reward dtypes do not match: {self.transitions.dtype.__name__} vs {self.rewards.dtype.__name__}')
+    if not self.transitions.flags.c_contiguous:
+      raise ValueError(
+          'mdp transitions should be C-contiguous, use np.ascontiguousarray')
 
     # Ensure transition probabilities sum to 1 for all actions and states.
-    for action_idx, transitions in enumerate(self.transitions):
-      state_probability_sums = transitions.sum(axis=-1)
-      state_probability_errors = np.abs(1 - state_probability_sums)
-      failed_unity = np.where(
-          state_probability_errors > _TRANSITION_SUM_TOLERANCE,
-          True,
-          False)
-      num_invalid_states = np.sum(failed_unity)
-      if num_invalid_states:
-        bad_states = np.argwhere(failed_unity)
-        raise ValueError(
-            f'Invalid Decision Process, action:{action_idx}, some states do not have transitions that sum to 1: {bad_states}')
+    state_probability_errors = np.abs(1. - self.transitions.sum(axis=-1))
+    # Negated <= so NaN sums also fail.
+    failed_unity = ~(state_probability_errors <= _TRANSITION_SUM_TOLERANCE)
+    if failed_unity.any():
+      bad_action_states = np.argwhere(failed_unity)
+      raise ValueError(
+          f'Invalid Decision Process, some (action, state) pairs do not have transitions that sum to 1: {bad_action_states}')
 
   @property
   def num_states(self):
     return self.transitions.shape[1]
 
+  @functools.cached_property
+  def flat_transitions(self):
+    """|A||S| x |S| view of transitions, CSR if self.sparse.
+
+    Lets all action values be computed with a single matrix-vector product,
+    e.g. flat_transitions.dot(values).reshape(rewards.shape).
+    """
+    flat_transitions = self.transitions.reshape(
+        (-1, self.transitions.shape[-1]))
+    if self.sparse:
+      # Imported here so scipy is only needed when sparse is requested.
+      from scipy import sparse
+      return sparse.csr_matrix(flat_transitions)
+    return flat_transitions
+
   @property
   def num_actions(self):
     return len(self.transitions)
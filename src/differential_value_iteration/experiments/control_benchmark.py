@@ -23,6 +23,8 @@ _SYNCHRONIZED = flags.DEFINE_bool('synchronized', True,
                                   'Run algorithms in synchronized mode.')
 _64bit = flags.DEFINE_bool('64bit', False,
                            'Use 64 bit precision (default is 32 bit).')
+_SPARSE = flags.DEFINE_bool('sparse', False,
+                            'Use sparse (CSR) transitions for GARET problems.')
 
 _CONVERGENCE_TOLERANCE = flags.DEFINE_float('convergence_tolerance', 1e-5,
                                             'Tolerance for convergence.')
@@ -82,7 +84,8 @@ def run(
           change_summary += np.mean(np.abs(changes))
         # Basically divide by num_states if running async.
         change_summary /= inner_loop_range
-        if alg.diverged():
+        # Divergence check, see evaluation_convergence._run_batch.
+        if not np.isfinite(change_summary):
           diverged = True
           converged = False
           break
@@ -138,13 +141,14 @@ def main(argv):
   if _MDP2.value:
     environments.append(micro.create_mdp2(dtype=problem_dtype))
   if _GARET1.value:
-    environments.append(garet.GARET1(dtype=problem_dtype))
+    environments.append(garet.GARET1(dtype=problem_dtype, sparse=_SPARSE.value))
   if _GARET2.value:
-    environments.append(garet.GARET2(dtype=problem_dtype))
+    environments.append(garet.GARET2(dtype=problem_dtype, sparse=_SPARSE.value))
   if _GARET3.value:
-    environments.append(garet.GARET3(dtype=problem_dtype))
+    environments.append(garet.GARET3(dtype=problem_dtype, sparse=_SPARSE.value))
   if _GARET_100.value:
-    environments.append(garet.GARET_100(dtype=problem_dtype))
+    environments.append(
+        garet.GARET_100(dtype=problem_dtype, sparse=_SPARSE.value))
 
   if not environments:
     raise ValueError('At least one environment required.')
@@ -5,7 +5,11 @@ different parameters for different algorithms at the moment.
 """
 
 import functools
+import itertools
+import multiprocessing
+import os
 from typing import Callable
+from typing import Optional
 from typing import Sequence
 
 import numpy as np
@@ -28,6 +32,14 @@ _SYNCHRONIZED = flags.DEFINE_bool('synchronized', True, 'Run algorithms in synch
 _64bit = flags.DEFINE_bool('64bit', False, 'Use 64 bit precision (default is 32 bit).')
 
 _CONVERGENCE_TOLERANCE = flags.DEFINE_float('convergence_tolerance', 1e-5, 'Tolerance for convergence.')
+_CONVERGENCE_CHECK_EVERY = flags.DEFINE_integer(
+    'convergence_check_every', 16,
+    'Check for convergence and divergence every this many iterations.',
+    lower_bound=1)
+_NUM_PROCESSES = flags.DEFINE_integer(
+    'num_processes', None,
+    'Number of worker processes (default is one per CPU, 1 runs serially).',
+    lower_bound=1)
 
 # DVI-specific flags
 flags.DEFINE_bool('dvi', True, 'Run Differential Value Iteration')
@@ -55,6 +67,122 @@ _MRP3 = flags.DEFINE_bool('mrp3', True, 'Include MRP3 in evaluation.')
 # Debugging flags
 _SAVE_FINAL_ESTIMATES = flags.DEFINE_bool('save_final_estimates', False, 'Save the final estimates.')
 
+def _run_batch(
+    environment: structure.MarkovRewardProcess,
+    algorithm_constructor: Callable[..., algorithm.Evaluation],
+    step_sizes: Sequence[float],
+    max_iters: int,
+    convergence_tolerance: float,
+    convergence_check_every: int):
+  """Runs one synchronized algorithm with all step sizes at once.
+
+  Each step size gets its own row of value estimates, so a single batched
+  update advances every run. Rows are independent: a run that has converged
+  or diverged keeps being updated, but its outcome is recorded when it stops.
+  Module level so it can be pickled and sent to worker processes.
+
+  Returns:
+    List with an (algorithm name, converged, iterations, final changes, final
+    estimates) tuple per step size.
+  """
+  num_runs = len(step_sizes)
+  num_states = environment.num_states
+  dtype = environment.rewards.dtype
+  # Match the environment dtype so the algorithm does not need to convert.
+  alg = algorithm_constructor(
+      mrp=environment,
+      initial_values=np.zeros((num_runs, num_states), dtype=dtype),
+      step_size=np.asarray(step_sizes, dtype=dtype)[:, None],
+      synchronized=True)
+  module_name = alg.__class__.__module__.split('.')[-1]
+  alg_name = f'{module_name}::{alg.__class__.__name__}'
+  # Reused every check to summarize changes.
+  abs_changes = np.empty((num_runs, num_states), dtype=dtype)
+
+  def outcome(run_idx: int, converged: bool):
+    estimates = {estimate_name: np.array(estimate[run_idx])
+                 for estimate_name, estimate in alg.get_estimates().items()}
+    final_changes = None if changes is None else changes[run_idx].copy()
+    return alg_name, converged, i, final_changes, estimates
+
+  outcomes = [None] * num_runs
+  running = np.ones(num_runs, dtype=bool)
+  i = 0
+  changes = None
+  for i in range(max_iters):
+    changes = alg.update()
+    if (i + 1) % convergence_check_every and i + 1 < max_iters:
+      continue
+
+    # Mean instead of sum so tolerance scales with num_states.
+    np.abs(changes, out=abs_changes)
+    change_summaries = abs_changes.mean(axis=-1)
+    # Non-finite values or r_bar always give non-finite changes, so this
+    # catches divergence without another pass over the values.
+    diverged = ~np.isfinite(change_summaries)
+    converged = (change_summaries <= convergence_tolerance) & (i > 1)
+    for run_idx in np.flatnonzero(running & diverged):
+      outcomes[run_idx] = outcome(run_idx, converged=False)
+    for run_idx in np.flatnonzero(running & converged):
+      outcomes[run_idx] = outcome(run_idx, converged=True)
+    running &= ~(diverged | converged)
+    if not running.any():
+      break
+  for run_idx in np.flatnonzero(running):
+    outcomes[run_idx] = outcome(run_idx, converged=False)
+  return outcomes
+
+
+def _run_async(
+    environment: structure.MarkovRewardProcess,
+    algorithm_constructor: Callable[..., algorithm.Evaluation],
+    step_sizes: Sequence[float],
+    max_iters: int,
+    convergence_tolerance: float,
+    convergence_check_every: int):
+  """Runs one asynchronous algorithm with each step size in turn.
+
+  Same arguments and return value as _run_batch.
+  """
+  outcomes = []
+  num_states = environment.num_states
+  # Algorithms copy initial values, so one dtype-matched buffer is shared by
+  # every step size.
+  initial_values = np.zeros(num_states, dtype=environment.rewards.dtype)
+  for step_size in step_sizes:
+    converged = False
+    alg = algorithm_constructor(mrp=environment,
+                                initial_values=initial_values,
+                                step_size=step_size,
+                                synchronized=False)
+    i = 0
+    changes = None
+    for i in range(max_iters):
+      if (i + 1) % convergence_check_every and i + 1 < max_iters:
+        for _ in range(num_states):
+          changes = alg.update()
+        continue
+
+      change_summary = 0.
+      for _ in range(num_states):
+        changes = alg.update()
+        change_summary += abs(changes)
+      # Mean instead of sum so tolerance scales with num_states.
+      change_summary /= num_states
+      # Divergence check, see _run_batch.
+      if not np.isfinite(change_summary):
+        converged = False
+        break
+
+      if change_summary <= convergence_tolerance and i > 1:
+        converged = True
+        break
+    module_name = alg.__class__.__module__.split('.')[-1]
+    alg_name = f'{module_name}::{alg.__class__.__name__}'
+    outcomes.append((alg_name, converged, i, changes, alg.get_estimates()))
+  return outcomes
+
+
 def run(
     environments: Sequence[structure.MarkovRewardProcess],
     algorithm_constructors: Sequence[Callable[..., algorithm.Evaluation]],
@@ -62,7 +190,9 @@ def run(
     max_iters: int,
     convergence_tolerance: float,
     synchronized: bool,
-    save_final_estimates: bool):
+    save_final_estimates: bool,
+    convergence_check_every: int = 16,
+    num_processes: Optional[int] = None):
   """Runs a list of algorithms on a list of environments and prints outcomes.
     Params:
       environments: Sequence of Markov Reward Processes to run.
@@ -73,59 +203,72 @@ def run(
       max_iters: Maximum number of iterations before declaring fail to converge.
       convergence_tolerance: Criteria for convergence.
       synchronized: Run algorithms in synchronized or asynchronous mode.
-      save_final_estimates: Save the final (dictionary of) estimates to a file
+        Synchronized runs update all step sizes together as one batch.
+      save_final_estimates: Save the final estimates of every run to a single
+        compressed .npz file in results/ after all runs finish.
+      convergence_check_every: Only summarize changes and check for
+        convergence/divergence every this many iterations (and on the last).
+      num_processes: Number of worker processes to spread runs over. Defaults
+        to one per CPU. 1 runs everything in this process.
       """
+  if convergence_check_every < 1:
+    raise ValueError(
+        f'convergence_check_every should be at least 1, not: {convergence_check_every}')
+  if num_processes is not None and num_processes < 1:
+    raise ValueError(
+        f'num_processes should be at least 1, not: {num_processes}')
+  if synchronized:
+    run_task = _run_batch
+    step_size_groups = [step_sizes]
+  else:
+    run_task = _run_async
+    step_size_groups = [[step_size] for step_size in step_sizes]
+  tasks = [(environment, algorithm_constructor, step_size_group, max_iters,
+            convergence_tolerance, convergence_check_every)
+           for environment in environments
+           for algorithm_constructor in algorithm_constructors
+           for step_size_group in step_size_groups]
+  if num_processes == 1:
+    results = list(itertools.starmap(run_task, tasks))
+  else:
+    with multiprocessing.Pool(num_processes) as pool:
+      results = pool.starmap(run_task, tasks)
+
+  # Results are in task order, so print and save as if run serially.
+  final_estimates = {}
+  results = itertools.chain.from_iterable(results)
   for environment in environments:
-    initial_values = np.zeros(environment.num_states)
-    inner_loop_range = 1 if synchronized else environment.num_states
-    for algorithm_constructor in algorithm_constructors:
+    for alg_idx, algorithm_constructor in enumerate(algorithm_constructors):
       print(f'Running {algorithm_constructor} on {environment.name}')
       for step_size in step_sizes:
-
-        converged = False
-        alg = algorithm_constructor(mrp=environment,
-                                    initial_values=initial_values,
-                                    step_size=step_size,
-                                    synchronized=synchronized)
-        for i in range(max_iters):
-          change_summary = 0.
-          for _ in range(inner_loop_range):
-            changes = alg.update()
-            # Mean instead of sum so tolerance scales with num_states.
-            change_summary += np.mean(np.abs(changes))
-          # Basically divide by num_states if running async.
-          change_summary /= inner_loop_range
-          if alg.diverged():
-            converged = False
-            break
-
-          if change_summary <= convergence_tolerance and i > 1:
-            converged = True
-            break
+        alg_name, converged, i, changes, estimates = next(results)
         print(
             f'step_size:{step_size:.5f}\tConverged:{converged}\tafter {i} iterations\tFinal Changes:{changes}')
         if save_final_estimates:
-            estimates = alg.get_estimates()
-            # is there a simple way of making the filename more accessible?
-            # filename = f'results/{environment.__name__}_{alg.__name__}_{step_size}'
-            filename = str(time.time())
-            full_path = 'results/' + filename   # directory can be a command-line argument as well
-            np.save(full_path, estimates)
-            # we can also save a string with the above convergence details
-            print(f'Results saved in: {full_path}')
+          run_name = f'{environment.name}__{alg_idx}_{alg_name}__{step_size:.5f}'
+          for estimate_name, estimate in estimates.items():
+            final_estimates[f'{run_name}__{estimate_name}'] = estimate
+
+  if save_final_estimates:
+    os.makedirs('results', exist_ok=True)
+    full_path = f'results/{int(time.time())}.npz'
+    np.savez_compressed(full_path, **final_estimates)
+    print(f'Results saved in: {full_path}')
 
 
 def main(argv):
   del argv  # Stop linter from complaining about unused argv.
 
   algorithm_constructors = []
+  problem_dtype = np.float64 if _64bit.value else np.float32
 
   # Create constructors that only depends on params common to all algorithms.
   if FLAGS.dvi:
     betas = np.geomspace(start=FLAGS.dvi_minimum_beta,
                          stop=FLAGS.dvi_maximum_beta,
                          num=FLAGS.dvi_num_betas,
-                         endpoint=True)
+                         endpoint=True,
+                         dtype=problem_dtype)
     for beta in betas:
       dvi_algorithm = functools.partial(dvi.Evaluation, beta=beta,
                                         initial_r_bar=FLAGS.dvi_initial_rbar)
@@ -135,7 +278,8 @@ def main(argv):
     betas = np.geomspace(start=FLAGS.mdvi_minimum_beta,
                          stop=FLAGS.mdvi_maximum_beta,
                          num=FLAGS.mdvi_num_betas,
-                         endpoint=True)
+                         endpoint=True,
+                         dtype=problem_dtype)
     for beta in betas:
       mdvi_algorithm = functools.partial(mdvi.Evaluation, beta=beta,
                                          initial_r_bar=FLAGS.mdvi_initial_rbar)
@@ -154,10 +298,10 @@ def main(argv):
       start=_MINIMUM_STEP_SIZE.value,
       stop=_MAXIMUM_STEP_SIZE.value,
       num=_NUM_STEP_SIZES.value,
-      endpoint=True)
+      endpoint=True,
+      dtype=problem_dtype)
 
   environments = []
-  problem_dtype = np.float64 if _64bit.value else np.float32
   if _MRP1.value:
     environments.append(micro.create_mrp1(dtype=problem_dtype))
   if _MRP2.value:
@@ -174,7 +318,9 @@ def main(argv):
       max_iters=_MAX_ITERS.value,
       convergence_tolerance=_CONVERGENCE_TOLERANCE.value,
       synchronized=_SYNCHRONIZED.value,
-      save_final_estimates=_SAVE_FINAL_ESTIMATES.value)
+      save_final_estimates=_SAVE_FINAL_ESTIMATES.value,
+      convergence_check_every=_CONVERGENCE_CHECK_EVERY.value,
+      num_processes=_NUM_PROCESSES.value)
 
 
 if __name__ == '__main__':
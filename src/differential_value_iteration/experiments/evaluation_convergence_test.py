@@ -0,0 +1,133 @@
+"""Tests for batched synchronized runs in the evaluation sweep."""
+import functools
+import itertools
+
+from absl.testing import absltest
+from absl.testing import parameterized
+
+from differential_value_iteration.algorithms import dvi
+from differential_value_iteration.algorithms import mdvi
+from differential_value_iteration.algorithms import rvi
+from differential_value_iteration.environments import micro
+from differential_value_iteration.experiments import evaluation_convergence
+
+import numpy as np
+
+_MAX_ITERS = 1000
+_CONVERGENCE_TOLERANCE = 1e-5
+_CONVERGENCE_CHECK_EVERY = 16
+# On mrp1 these hit max_iters, converge and diverge for every algorithm.
+_STEP_SIZES = (.001, .2, 3.)
+_ALGORITHM_CONSTRUCTORS = (
+    functools.partial(dvi.Evaluation, beta=.5, initial_r_bar=0.),
+    functools.partial(mdvi.Evaluation, beta=.5, initial_r_bar=0.),
+    functools.partial(rvi.Evaluation, reference_index=0),
+)
+
+
+def _run_unbatched(environment, algorithm_constructor, step_size):
+  """Runs one step size with the same check schedule as _run_batch."""
+  alg = algorithm_constructor(
+      mrp=environment,
+      initial_values=np.zeros(environment.num_states, dtype=np.float64),
+      step_size=step_size,
+      synchronized=True)
+  converged = False
+  i = 0
+  changes = None
+  for i in range(_MAX_ITERS):
+    changes = alg.update()
+    if (i + 1) % _CONVERGENCE_CHECK_EVERY and i + 1 < _MAX_ITERS:
+      continue
+    change_summary = np.mean(np.abs(changes))
+    if not np.isfinite(change_summary):
+      break
+    if change_summary <= _CONVERGENCE_TOLERANCE and i > 1:
+      converged = True
+      break
+  return converged, i, changes, alg.get_estimates()
+
+
+class EvaluationConvergenceTest(parameterized.TestCase):
+
+  def setUp(self):
+    super().setUp()
+    # Some runs diverge on purpose, so hide their overflow warnings.
+    self.enter_context(np.errstate(over='ignore', invalid='ignore'))
+
+  @parameterized.parameters(itertools.product(
+      (micro.create_mrp1, micro.create_mrp2, micro.create_mrp3),
+      _ALGORITHM_CONSTRUCTORS))
+  def test_run_batch_matches_unbatched(self, environment_constructor,
+                                       algorithm_constructor):
+    environment = environment_constructor(dtype=np.float64)
+    batch_outcomes = evaluation_convergence._run_batch(
+        environment=environment,
+        algorithm_constructor=algorithm_constructor,
+        step_sizes=_STEP_SIZES,
+        max_iters=_MAX_ITERS,
+        convergence_tolerance=_CONVERGENCE_TOLERANCE,
+        convergence_check_every=_CONVERGENCE_CHECK_EVERY)
+    self.assertLen(batch_outcomes, len(_STEP_SIZES))
+    for step_size, batch_outcome in zip(_STEP_SIZES, batch_outcomes):
+      _, converged, i, changes, estimates = batch_outcome
+      (expected_converged, expected_i, expected_changes,
+       expected_estimates) = _run_unbatched(environment,
+                                            algorithm_constructor,
+                                            step_size)
+      with self.subTest(f'{step_size}_converged'):
+        self.assertEqual(converged, expected_converged)
+      with self.subTest(f'{step_size}_iterations'):
+        self.assertEqual(i, expected_i)
+      with self.subTest(f'{step_size}_changes'):
+        np.testing.assert_allclose(changes, expected_changes, rtol=1e-10,
+                                   atol=1e-10)
+      with self.subTest(f'{step_size}_estimates'):
+        self.assertEqual(estimates.keys(), expected_estimates.keys())
+        for estimate_name, estimate in estimates.items():
+          np.testing.assert_allclose(estimate,
+                                     expected_estimates[estimate_name],
+                                     rtol=1e-10, atol=1e-10)
+
+  @parameterized.parameters(
+      (algorithm_constructor,)
+      for algorithm_constructor in _ALGORITHM_CONSTRUCTORS)
+  def test_run_batch_records_each_outcome(self, algorithm_constructor):
+    """Runs that hit max_iters, converge and diverge are told apart."""
+    batch_outcomes = evaluation_convergence._run_batch(
+        environment=micro.create_mrp1(dtype=np.float64),
+        algorithm_constructor=algorithm_constructor,
+        step_sizes=_STEP_SIZES,
+        max_iters=_MAX_ITERS,
+        convergence_tolerance=_CONVERGENCE_TOLERANCE,
+        convergence_check_every=_CONVERGENCE_CHECK_EVERY)
+    (_, max_iters_converged, max_iters_i, max_iters_changes, _), (
+        _, converged, converged_i, _, _), (
+        _, diverged_converged, diverged_i, diverged_changes, _) = batch_outcomes
+    with self.subTest('max_iters'):
+      self.assertFalse(max_iters_converged)
+      self.assertEqual(max_iters_i, _MAX_ITERS - 1)
+      self.assertTrue(np.isfinite(max_iters_changes).all())
+    with self.subTest('converged'):
+      self.assertTrue(converged)
+      self.assertLess(converged_i, _MAX_ITERS - 1)
+    with self.subTest('diverged'):
+      self.assertFalse(diverged_converged)
+      self.assertLess(diverged_i, _MAX_ITERS - 1)
+      self.assertFalse(np.isfinite(diverged_changes).all())
+
+  def test_run_serially(self):
+    """run() with num_processes=1 runs in process without errors."""
+    evaluation_convergence.run(
+        environments=[micro.create_mrp1(dtype=np.float64)],
+        algorithm_constructors=_ALGORITHM_CONSTRUCTORS,
+        step_sizes=_STEP_SIZES,
+        max_iters=_MAX_ITERS,
+        convergence_tolerance=_CONVERGENCE_TOLERANCE,
+        synchronized=True,
+        save_final_estimates=False,
+        num_processes=1)
+
+
+if __name__ == '__main__':
+  absltest.main()
@@ -1,4 +1,8 @@
 """Tests GARET MDP environment generator."""
+import itertools
+import subprocess
+import sys
+
 from absl.testing import absltest
 from absl.testing import parameterized
 
@@ -8,24 +12,95 @@ import numpy as np
 
 class GaretTest(parameterized.TestCase):
 
-  @parameterized.parameters(
-      (42, 2, 1, 1),
-      (42, 2, 2, 2),
-      (42, 10, 2, 2),
-      (42, 10, 2, 3),
-      (42, 100, 2, 3),
-  )
-  def test_create_mdp(self, seed: int, num_states: int, num_actions: int, branching_factor: int):
+  @parameterized.parameters(itertools.product(
+      (
+          (42, 2, 1, 1),
+          (42, 2, 2, 2),
+          (42, 10, 2, 2),
+          (42, 10, 2, 3),
+          (42, 100, 2, 3),
+      ),
+      (False, True)))
+  def test_create_mdp(self, params, use_jax: bool):
     """MarkovDecisionProcess does thorough checks, ensures no errors raised."""
+    seed, num_states, num_actions, branching_factor = params
     mdp = garet.create(
         seed=seed,
         num_states=num_states,
         num_actions=num_actions,
         branching_factor=branching_factor,
         dtype=np.float32,
+        use_jax=use_jax,
     )
     self.assertTrue(mdp is not None)
 
+  @parameterized.parameters(False, True)
+  def test_branching_factor(self, use_jax: bool):
+    """Each (s, a) pair has exactly branching_factor possible next states."""
+    mdp = garet.create(
+        seed=42,
+        num_states=10,
+        num_actions=2,
+        branching_factor=3,
+        dtype=np.float32,
+        use_jax=use_jax,
+    )
+    np.testing.assert_array_equal(np.count_nonzero(mdp.transitions, axis=-1),
+                                  3)
+
+  @parameterized.parameters(False, True)
+  def test_transitions_are_c_contiguous(self, use_jax: bool):
+    mdp = garet.create(
+        seed=42,
+        num_states=10,
+        num_actions=2,
+        branching_factor=3,
+        dtype=np.float32,
+        use_jax=use_jax,
+    )
+    self.assertTrue(mdp.transitions.flags.c_contiguous)
+
+  def test_numpy_backend_does_not_import_jax(self):
+    # Subprocess since other tests import JAX in this one.
+    script = ('import sys\n'
+              'import numpy as np\n'
+              'from differential_value_iteration.environments import garet\n'
+              'garet.GARET1(dtype=np.float32)\n'
+              "assert 'jax' not in sys.modules, 'jax was imported'\n")
+    result = subprocess.run([sys.executable, '-c', script],
+                            capture_output=True, text=True)
+    self.assertEqual(result.returncode, 0, msg=result.stderr)
+
+  def test_sparse_matches_dense(self):
+    """Sparse flat transitions hold the same values as the dense ones."""
+    mdp = garet.create(
+        seed=42,
+        num_states=100,
+        num_actions=2,
+        branching_factor=3,
+        dtype=np.float32,
+        sparse=True,
+    )
+    flat_transitions = mdp.flat_transitions
+    with self.subTest('nonzeros'):
+      self.assertEqual(flat_transitions.nnz, 100 * 2 * 3)
+    with self.subTest('dtype'):
+      self.assertEqual(flat_transitions.dtype, np.float32)
+    with self.subTest('values'):
+      np.testing.assert_array_equal(flat_transitions.toarray(),
+                                    mdp.transitions.reshape((-1, 100)))
+
+  def test_create_is_cached(self):
+    """Repeated calls share one read-only instance."""
+    mdp = garet.GARET1(dtype=np.float32)
+    with self.subTest('same_instance'):
+      self.assertIs(mdp, garet.GARET1(dtype=np.float32))
+    with self.subTest('dtype_in_key'):
+      self.assertIsNot(mdp, garet.GARET1(dtype=np.float64))
+    with self.subTest('read_only'):
+      self.assertFalse(mdp.transitions.flags.writeable)
+      self.assertFalse(mdp.rewards.flags.writeable)
+
 
 if __name__ == '__main__':
   absltest.main()
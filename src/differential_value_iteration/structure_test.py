@@ -0,0 +1,39 @@
+"""Tests MRP and MDP validation."""
+from absl.testing import absltest
+
+from differential_value_iteration.environments import structure
+
+import numpy as np
+
+
+class StructureTest(absltest.TestCase):
+
+  def test_mrp_nan_transitions_raise(self):
+    with self.assertRaises(ValueError):
+      structure.MarkovRewardProcess(
+          transitions=np.array([[np.nan, 1.], [0., 1.]], dtype=np.float32),
+          rewards=np.zeros(2, dtype=np.float32),
+          name='nan mrp')
+
+  def test_mdp_nan_transitions_raise(self):
+    transitions = np.array([[[np.nan, 1.], [0., 1.]],
+                            [[1., 0.], [0., 1.]]], dtype=np.float32)
+    with self.assertRaises(ValueError):
+      structure.MarkovDecisionProcess(
+          transitions=transitions,
+          rewards=np.zeros((2, 2), dtype=np.float32),
+          name='nan mdp')
+
+  def test_mdp_strided_transitions_raise(self):
+    transitions = np.swapaxes(
+        np.array([[[1., 0.], [0., 1.]],
+                  [[0., 1.], [1., 0.]]], dtype=np.float32), 0, 1)
+    with self.assertRaises(ValueError):
+      structure.MarkovDecisionProcess(
+          transitions=transitions,
+          rewards=np.zeros((2, 2), dtype=np.float32),
+          name='strided mdp')
+
+
+if __name__ == '__main__':
+  absltest.main()